@@ -4,6 +4,10 @@ Minimal code - LLM makes ALL decisions about tool usage and responses.
 """
 
 import os
+import sys
+import atexit
+import importlib
+import signal
 import logging
 import asyncio
 from dataclasses import dataclass
@@ -14,8 +18,8 @@ load_dotenv()
 
 from services.llm_service import HuggingFaceInferenceService
 from services.llm_orchestrator import LLMOrchestrator
-from services.telegram_service import TelegramService, TelegramBotPoller
-from config import load_config
+from services.telegram_service import TelegramService, TelegramBotPoller, TelegramWebhookServer
+from config import load_config, get_bot_pid_file
 
 
 @dataclass
@@ -71,9 +75,8 @@ class NAgentBot:
     def _register_tools(self):
         """Register all available tools"""
         try:
-            # Import and register email tools
-            from tools.email_tools import register_email_tools
-            register_email_tools()
+            # Email tools register their classes on import
+            importlib.import_module('tools.email_tools')
             
             # Import and register calendar tools  
             from tools.calendar_tools import register_calendar_tools
@@ -81,7 +84,7 @@ class NAgentBot:
             
             # Log available tools
             from services.tool_registry import tool_registry
-            tool_names = list(tool_registry.tools.keys())
+            tool_names = tool_registry.registered_names()
             self.logger.info(f"Registered tools: {tool_names}")
             
         except Exception as e:
@@ -168,14 +171,31 @@ class NAgentBot:
                     )
             
             # Create poller with proper parameters
-            poller = TelegramBotPoller(self.telegram, handle_message)
-            self.logger.info("Starting Telegram bot polling...")
+            if os.getenv('TELEGRAM_MODE', 'longpoll').lower() == 'webhook':
+                poller = TelegramWebhookServer(
+                    self.telegram,
+                    handle_message,
+                    public_url=os.getenv('TELEGRAM_WEBHOOK_URL', ''),
+                    secret_token=os.getenv('TELEGRAM_WEBHOOK_SECRET', ''),
+                    port=int(os.getenv('TELEGRAM_WEBHOOK_PORT', '8080'))
+                )
+                self.logger.info("Starting Telegram bot webhook server...")
+            else:
+                poller = TelegramBotPoller(self.telegram, handle_message)
+                self.logger.info("Starting Telegram bot polling...")
             
             # Start polling
             await poller.start_polling()
             
         except Exception as e:
             self.logger.error(f"Error in Telegram bot: {e}")
+        finally:
+            await self.close()
+    
+    async def close(self):
+        """Release connections held by the tools"""
+        from tools.email_tools import close_gmail_client
+        await close_gmail_client()
     
     def check_system_status(self) -> dict:
         """Check system status"""
@@ -189,6 +209,75 @@ class NAgentBot:
         }
 
 
+def _running_bot_pid(pid_file: str):
+    """PID of another live bot_new.py recorded in the pidfile, or None"""
+    try:
+        with open(pid_file) as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+    if pid == os.getpid():
+        return None
+    
+    try:
+        import psutil
+    except ImportError:
+        # Without psutil, any live process with that PID counts
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return None
+        except PermissionError:
+            pass
+        return pid
+    
+    try:
+        return pid if 'bot_new.py' in ' '.join(psutil.Process(pid).cmdline()) else None
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+
+def write_pid_file() -> bool:
+    """Record this process in the pidfile so start_bot.py can find it quickly
+    
+    Returns False when the pidfile already belongs to another running bot,
+    since a second Telegram poller would conflict with it.
+    """
+    pid_file = get_bot_pid_file()
+    pid = os.getpid()
+    
+    running_pid = _running_bot_pid(pid_file)
+    if running_pid is not None:
+        print(f"❌ Telegram bot already running (PID {running_pid}), use start_bot.py to restart it")
+        return False
+    
+    try:
+        # The pidfile may live in the shared temp dir: never follow a planted symlink
+        fd = os.open(pid_file, os.O_CREAT | os.O_WRONLY | os.O_TRUNC | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(pid))
+    except OSError as e:
+        logging.getLogger(__name__).warning(f"Could not write pidfile {pid_file}: {e}")
+        return True
+    
+    def remove_pid_file():
+        try:
+            with open(pid_file) as f:
+                if f.read().strip() == str(pid):
+                    os.remove(pid_file)
+        except OSError:
+            pass
+    
+    atexit.register(remove_pid_file)
+    
+    # start_bot.py stops the bot with SIGTERM; exit normally so atexit runs
+    def handle_sigterm(signum, frame):
+        sys.exit(0)
+    
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    return True
+
+
 async def main():
     """Main entry point for CLI testing"""
     bot = NAgentBot()
@@ -231,12 +320,16 @@ async def main():
             break
         except Exception as e:
             print(f"Error: {e}")
+    
+    await bot.close()
 
 
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) > 1 and sys.argv[1] == "telegram":
+        # Only the Telegram poller is tracked, a CLI session must not replace it
+        if not write_pid_file():
+            sys.exit(1)
+        
         # Run Telegram bot
         bot = NAgentBot()
         try:
@@ -7,6 +7,7 @@ import os
 import yaml
 import base64
 import json
+import tempfile
 from typing import Dict, Any
 
 
@@ -37,6 +38,16 @@ def setup_google_credentials():
             print(f"Warning: Failed to write JSON credentials: {e}")
 
 
+def get_bot_pid_file() -> str:
+    """Path of the pidfile written by a running bot_new.py process"""
+    runtime_dir = os.getenv('XDG_RUNTIME_DIR')
+    if not runtime_dir and hasattr(os, 'getuid'):
+        runtime_dir = f"/run/user/{os.getuid()}"
+    if not runtime_dir or not os.path.isdir(runtime_dir):
+        runtime_dir = tempfile.gettempdir()
+    return os.path.join(runtime_dir, 'nagent-bot.pid')
+
+
 def load_config(config_path: str = "config/config.yaml") -> Dict[str, Any]:
     """Load configuration from YAML file"""
     
@@ -0,0 +1,126 @@
+"""
+Gmail REST Client
+Minimal async Gmail API client over httpx for the endpoints the email tools use.
+"""
+
+import asyncio
+import random
+import importlib.util
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from google.auth.transport.requests import Request
+
+# httpx only needs h2 importable to speak HTTP/2
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+
+GMAIL_API_BASE = "https://gmail.googleapis.com/gmail/v1/users/me"
+
+# Requests in flight at once; also caps HTTP/1.1 connections when h2 is missing
+MAX_CONCURRENT_REQUESTS = 10
+
+# Attempts per request on rate limits (429) and Gmail server errors (5xx)
+MAX_ATTEMPTS = 4
+
+# Longest wait before a retry; a longer Retry-After fails the request instead
+MAX_RETRY_DELAY = 30
+
+
+class GmailRest:
+    """Async Gmail client with bounded concurrency over a shared connection pool"""
+    
+    def __init__(self, credentials, on_refresh: Optional[Callable[[], None]] = None):
+        self._credentials = credentials
+        self._on_refresh = on_refresh
+        self.logger = logging.getLogger(__name__)
+        self._client = httpx.AsyncClient(
+            base_url=GMAIL_API_BASE,
+            http2=HTTP2_AVAILABLE,
+            timeout=30,
+            limits=httpx.Limits(max_connections=MAX_CONCURRENT_REQUESTS)
+        )
+        self._request_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self._refresh_lock = asyncio.Lock()
+    
+    async def _auth_headers(self) -> Dict[str, str]:
+        """Bearer token header, refreshing the access token when it expired"""
+        if not self._credentials.valid:
+            async with self._refresh_lock:
+                # Another request may have refreshed while this one waited
+                if not self._credentials.valid:
+                    # google-auth refresh is blocking, keep it off the event loop
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, self._credentials.refresh, Request()
+                    )
+                    if self._on_refresh:
+                        self._on_refresh()
+        return {'Authorization': f"Bearer {self._credentials.token}"}
+    
+    async def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        """Send a request and return the decoded JSON body, retrying 429 and 5xx"""
+        for attempt in range(MAX_ATTEMPTS):
+            async with self._request_slots:
+                response = await self._client.request(method, path, headers=await self._auth_headers(), **kwargs)
+            
+            # A 5xx send may still have gone out, so only reads retry on server errors
+            retryable = response.status_code == 429 or (response.status_code >= 500 and method == 'GET')
+            if not retryable or attempt == MAX_ATTEMPTS - 1:
+                break
+            
+            try:
+                delay = float(response.headers['Retry-After'])
+            except (KeyError, ValueError):
+                delay = 2 ** attempt + random.uniform(0, 1)
+            if delay > MAX_RETRY_DELAY:
+                break
+            self.logger.warning(f"Gmail returned {response.status_code}, retrying after {delay:.1f}s")
+            await asyncio.sleep(delay)
+        
+        response.raise_for_status()
+        return response.json()
+    
+    async def list_messages(self, query: str, max_results: int, fields: Optional[str] = None) -> Dict[str, Any]:
+        """List messages matching a Gmail search query"""
+        params = {'q': query, 'maxResults': max_results}
+        if fields:
+            params['fields'] = fields
+        return await self._request('GET', '/messages', params=params)
+    
+    async def get_message(self, message_id: str, metadata_headers: List[str],
+                          fields: Optional[str] = None) -> Dict[str, Any]:
+        """Get one message's metadata and the requested headers"""
+        params = {'format': 'metadata', 'metadataHeaders': metadata_headers}
+        if fields:
+            params['fields'] = fields
+        return await self._request('GET', f"/messages/{message_id}", params=params)
+    
+    async def get_messages(self, message_ids: List[str], metadata_headers: List[str],
+                           fields: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get several messages concurrently, skipping the ones that fail"""
+        results = await asyncio.gather(
+            *(self.get_message(mid, metadata_headers, fields) for mid in message_ids),
+            return_exceptions=True
+        )
+        
+        messages = []
+        for message_id, result in zip(message_ids, results):
+            if isinstance(result, Exception):
+                self.logger.warning(f"Failed to get details for email {message_id}: {result}")
+            else:
+                messages.append(result)
+        return messages
+    
+    async def get_label(self, label_id: str, fields: Optional[str] = None) -> Dict[str, Any]:
+        """Get a label, including its message counters"""
+        params = {'fields': fields} if fields else None
+        return await self._request('GET', f"/labels/{label_id}", params=params)
+    
+    async def send(self, message: Dict[str, str]) -> Dict[str, Any]:
+        """Send a message given as {'raw': <base64url RFC 5322>}"""
+        return await self._request('POST', '/messages/send', json=message)
+    
+    async def aclose(self):
+        """Close the underlying connection pool"""
+        await self._client.aclose()
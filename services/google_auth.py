@@ -7,6 +7,8 @@ import os
 import json
 import logging
 from typing import Optional, List
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -64,14 +66,29 @@ class GoogleAuthManager:
                     return False
         
         # Save credentials for next run
+        self.save_credentials()
+        
+        return True
+    
+    def save_credentials(self):
+        """Write the current credentials to the token file"""
         try:
             with open(self.token_path, 'w') as token_file:
                 token_file.write(self._credentials.to_json())
             self.logger.info("Saved credentials to token file")
         except Exception as e:
             self.logger.warning(f"Failed to save credentials: {e}")
-        
-        return True
+    
+    def authorized_http(self) -> AuthorizedHttp:
+        """Authorized keep-alive HTTP transport; httplib2 is not thread-safe, so one per thread"""
+        return AuthorizedHttp(self._credentials, http=httplib2.Http(timeout=30))
+    
+    def get_credentials(self) -> Credentials:
+        """Get authenticated credentials for clients that bring their own transport"""
+        if not self._credentials:
+            if not self.authenticate():
+                raise Exception("Failed to authenticate with Google APIs")
+        return self._credentials
     
     def get_gmail_service(self):
         """Get authenticated Gmail service"""
@@ -80,7 +97,7 @@ class GoogleAuthManager:
                 raise Exception("Failed to authenticate with Google APIs")
         
         try:
-            service = build('gmail', 'v1', credentials=self._credentials)
+            service = build('gmail', 'v1', http=self.authorized_http(), cache_discovery=False)
             self.logger.info("Created Gmail service")
             return service
         except Exception as e:
@@ -94,7 +111,7 @@ class GoogleAuthManager:
                 raise Exception("Failed to authenticate with Google APIs")
         
         try:
-            service = build('calendar', 'v3', credentials=self._credentials)
+            service = build('calendar', 'v3', http=self.authorized_http(), cache_discovery=False)
             self.logger.info("Created Calendar service")
             return service
         except Exception as e:
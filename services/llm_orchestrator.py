@@ -110,7 +110,7 @@ IMPORTANT RULES:
 9. Always provide parameters that make sense for the user's request
 
 EXAMPLES:
-- "How many unread emails?" → use get_unread_emails
+- "How many unread emails?" → use get_unread_emails with count_only=true
 - "Find emails from John last week" → use search_emails with appropriate query and days_back
 - "What's my next meeting?" → use get_upcoming_events with max_results=1
 - "Create meeting tomorrow at 2pm" → use create_calendar_event with proper datetime
@@ -242,7 +242,8 @@ Provide a helpful, natural response based on the tool results:"""
         if tool_name == 'get_unread_emails':
             emails = data.get('unread_emails', [])
             if not emails:
-                return "No unread emails found"
+                total_unread = data.get('total_unread', 0)
+                return f"{total_unread} unread emails" if total_unread else "No unread emails found"
             
             formatted = []
             for email in emails[:10]:  # Limit to 10 for readability
@@ -253,11 +254,16 @@ Provide a helpful, natural response based on the tool results:"""
                 
                 formatted.append(f"**{subject}** - De: {sender} - {date}\n   {snippet}")
             
-            return f"{len(emails)} emails:\n" + "\n".join(formatted)
+            result = f"{len(emails)} emails:\n" + "\n".join(formatted)
+            if data.get('details_missing'):
+                result += f"\n({data['details_missing']} more could not be loaded)"
+            return result
         
         elif tool_name == 'search_emails':
             emails = data.get('emails', [])
             if not emails:
+                if data.get('details_missing'):
+                    return f"{data['details_missing']} emails found, but their details could not be loaded"
                 return "No emails found for this search"
             
             formatted = []
@@ -269,7 +275,10 @@ Provide a helpful, natural response based on the tool results:"""
                 
                 formatted.append(f"**{subject}** - De: {sender} - {date}\n   {snippet}")
             
-            return f"{len(emails)} emails found:\n" + "\n".join(formatted)
+            result = f"{len(emails)} emails found:\n" + "\n".join(formatted)
+            if data.get('details_missing'):
+                result += f"\n({data['details_missing']} more could not be loaded)"
+            return result
         
         elif tool_name in ['get_upcoming_events', 'search_calendar_events']:
             events_key = 'upcoming_events' if 'upcoming_events' in data else 'events'
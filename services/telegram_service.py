@@ -4,13 +4,42 @@ Handles Telegram bot interactions including sending/receiving messages.
 """
 
 import os
+import time
+import random
 import asyncio
 import logging
+import threading
 from typing import Optional, Dict, Any, List
 import requests
 import json
+from functools import partial
 from datetime import datetime
 
+try:
+    from aiohttp import web
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    web = None
+    AIOHTTP_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """Serialize a request payload to JSON bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+
+# Idle per-chat send slots are dropped once this many chats have been seen
+MAX_CHAT_SEMAPHORES = 1000
+
 
 class TelegramService:
     """Service for Telegram bot communication"""
@@ -22,11 +51,83 @@ class TelegramService:
         
         # Base API URL
         self.api_base = f"https://api.telegram.org/bot{self.bot_token}"
+        
+        # Endpoint URLs are fixed per token, build them once
+        self._url_send = f"{self.api_base}/sendMessage"
+        self._url_action = f"{self.api_base}/sendChatAction"
+        self._url_updates = f"{self.api_base}/getUpdates"
+        self._url_me = f"{self.api_base}/getMe"
+        self._url_set_webhook = f"{self.api_base}/setWebhook"
+        self._url_delete_webhook = f"{self.api_base}/deleteWebhook"
+        
+        # Shared session keeps the TLS connection to api.telegram.org alive
+        self._session = requests.Session()
+        self._session.headers['Content-Type'] = 'application/json'
+        
+        # Bound outbound sends below Telegram's ~30 msg/s global limit and
+        # to one in-flight send per chat. These block, so _post_with_retry
+        # must only run in executor threads, never on the event loop.
+        self._global_sem = threading.BoundedSemaphore(25)
+        self._chat_sems: Dict[str, threading.Semaphore] = {}
+        self._chat_sems_lock = threading.Lock()
     
     def is_configured(self) -> bool:
         """Check if Telegram is properly configured"""
         return bool(self.bot_token and self.chat_id)
     
+    def _post(self, url: str, payload: Dict[str, Any], timeout: int) -> requests.Response:
+        """POST a JSON payload, serialized with orjson when available"""
+        return self._session.post(url, data=_json_dumps(payload), timeout=timeout)
+    
+    def _post_with_retry(self, url: str, payload: Dict[str, Any], timeout: int,
+                         max_retries: int = 5) -> requests.Response:
+        """POST, retrying on rate limits (429) and Telegram server errors (5xx)"""
+        # Queue on the chat first so waiting behind a rate-limited chat holds no global slot
+        with self._chat_sem(str(payload.get('chat_id'))), self._global_sem:
+            return self._post_with_backoff(url, payload, timeout, max_retries)
+    
+    def _chat_sem(self, chat_id: str) -> threading.Semaphore:
+        """Per-chat send slot, created on first use"""
+        sem = self._chat_sems.get(chat_id)
+        if sem is None:
+            with self._chat_sems_lock:
+                sem = self._chat_sems.get(chat_id)
+                if sem is None:
+                    if len(self._chat_sems) >= MAX_CHAT_SEMAPHORES:
+                        self._prune_chat_sems()
+                    sem = self._chat_sems[chat_id] = threading.Semaphore(1)
+        return sem
+    
+    def _prune_chat_sems(self):
+        """Drop the slots of chats with no send in flight, called with the lock held"""
+        for chat_id, sem in list(self._chat_sems.items()):
+            if sem.acquire(blocking=False):
+                del self._chat_sems[chat_id]
+                sem.release()
+    
+    def _post_with_backoff(self, url: str, payload: Dict[str, Any], timeout: int,
+                           max_retries: int) -> requests.Response:
+        """Retry loop behind _post_with_retry, called with the send slots held"""
+        rate_limited = False
+        for attempt in range(max_retries):
+            response = self._post(url, payload, timeout)
+            
+            if response.status_code == 429:
+                try:
+                    retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+                except ValueError:
+                    retry_after = 1
+                if not rate_limited:
+                    self.logger.warning(f"Telegram rate limit hit, retrying after {retry_after}s")
+                    rate_limited = True
+                time.sleep(retry_after)
+            elif response.status_code >= 500:
+                time.sleep(min(2 ** attempt, 30) + random.uniform(0, 1))
+            else:
+                return response
+        
+        return self._post(url, payload, timeout)
+    
     def test_connection(self) -> Dict[str, Any]:
         """Test Telegram bot connection"""
         result = {
@@ -42,7 +143,7 @@ class TelegramService:
         
         try:
             # Test bot token
-            response = requests.get(f"{self.api_base}/getMe", timeout=10)
+            response = self._session.get(self._url_me, timeout=10)
             if response.status_code == 200:
                 bot_info = response.json()['result']
                 result['bot_info'] = {
@@ -72,9 +173,9 @@ class TelegramService:
             return False
             
         try:
-            response = requests.post(
-                f"{self.api_base}/sendMessage",
-                json={
+            response = self._post_with_retry(
+                self._url_send,
+                {
                     'chat_id': self.chat_id,
                     'text': message,
                     'parse_mode': parse_mode,
@@ -101,8 +202,8 @@ class TelegramService:
             return []
             
         try:
-            response = requests.get(
-                f"{self.api_base}/getUpdates",
+            response = self._session.get(
+                self._url_updates,
                 params={
                     'offset': offset,
                     'timeout': timeout
@@ -121,6 +222,46 @@ class TelegramService:
             self.logger.error(f"Error getting Telegram updates: {e}")
             return []
     
+    def set_webhook(self, url: str, secret_token: str) -> bool:
+        """Register a webhook URL so Telegram pushes updates to us"""
+        if not self.is_configured():
+            return False
+            
+        try:
+            response = self._post(
+                self._url_set_webhook,
+                {
+                    'url': url,
+                    'secret_token': secret_token,
+                    'allowed_updates': ['message']
+                },
+                timeout=10
+            )
+            
+            if response.status_code == 200:
+                # The URL path carries the secret, so it is not logged
+                self.logger.info("Webhook set")
+                return True
+            else:
+                self.logger.error(f"Failed to set webhook: {response.text}")
+                return False
+                
+        except Exception as e:
+            self.logger.error(f"Error setting Telegram webhook: {e}")
+            return False
+    
+    def delete_webhook(self) -> bool:
+        """Remove the webhook so long polling can be used again"""
+        if not self.is_configured():
+            return False
+            
+        try:
+            response = self._post(self._url_delete_webhook, {}, timeout=10)
+            return response.status_code == 200
+        except Exception as e:
+            self.logger.error(f"Error deleting Telegram webhook: {e}")
+            return False
+    
     def send_typing_action(self, chat_id: str = None) -> bool:
         """Send typing action to show bot is processing"""
         if not self.is_configured():
@@ -129,9 +270,10 @@ class TelegramService:
         target_chat = chat_id or self.chat_id
         
         try:
-            response = requests.post(
-                f"{self.api_base}/sendChatAction",
-                json={
+            # Called on the event loop and useless when late: no retry, no send slots
+            response = self._post(
+                self._url_action,
+                {
                     'chat_id': target_chat,
                     'action': 'typing'
                 },
@@ -148,9 +290,9 @@ class TelegramService:
             return False
             
         try:
-            response = requests.post(
-                f"{self.api_base}/sendMessage",
-                json={
+            response = self._post_with_retry(
+                self._url_send,
+                {
                     'chat_id': chat_id,
                     'text': message,
                     'parse_mode': 'HTML',
@@ -172,25 +314,18 @@ class TelegramService:
     async def send_message_async(self, message: str, chat_id: str = None, parse_mode: str = 'HTML') -> bool:
         """Async version of send_message"""
         try:
-            # For now, just call the sync version in an executor
-            # In a production app, you'd use aiohttp
+            # requests is blocking, so the send runs in the loop's executor
             if chat_id:
-                result = await asyncio.get_event_loop().run_in_executor(
-                    None, 
-                    lambda: self.send_response_to_chat(chat_id, message)
-                )
-                if result:
-                    self.logger.info(f"Async send to {chat_id} result: Success")
-                else:
-                    self.logger.error(f"Async send to {chat_id} result: Failed - check previous error messages")
-                return result
+                send = partial(self.send_response_to_chat, chat_id, message)
             else:
-                result = await asyncio.get_event_loop().run_in_executor(
-                    None, 
-                    lambda: self.send_message(message)
-                )
-                self.logger.info(f"Async send result: {result}")
-                return result
+                send = partial(self.send_message, message, parse_mode)
+            
+            result = await asyncio.get_running_loop().run_in_executor(None, send)
+            if result:
+                self.logger.info(f"Async send to {chat_id or self.chat_id} result: Success")
+            else:
+                self.logger.error(f"Async send to {chat_id or self.chat_id} result: Failed - check previous error messages")
+            return result
         except Exception as e:
             self.logger.error(f"Error in async send_message: {e}")
             return False
@@ -280,8 +415,10 @@ class TelegramBotPoller:
                 
                 self.logger.info(f"Received message from {user_id}: {text}")
                 
-                # Send typing indicator
-                self.telegram_service.send_typing_action(chat_id)
+                # Send typing indicator without blocking the event loop
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.telegram_service.send_typing_action, chat_id
+                )
                 
                 # Process the message
                 if self.message_handler:
@@ -296,6 +433,116 @@ class TelegramBotPoller:
         self.logger.info("Stopping Telegram bot polling...")
 
 
+class TelegramWebhookServer(TelegramBotPoller):
+    """Receives Telegram updates through a webhook instead of long polling"""
+    
+    SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+    
+    def __init__(self, telegram_service: TelegramService, message_handler,
+                 public_url: str, secret_token: str, host: str = '0.0.0.0', port: int = 8080):
+        super().__init__(telegram_service, message_handler)
+        self.public_url = public_url.rstrip('/')
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self._runner = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._tasks = set()
+        # Updates for the same chat are handled in arrival order; a chat's
+        # lock is dropped once it has no update pending
+        self._chat_locks: Dict[str, asyncio.Lock] = {}
+        self._chat_pending: Dict[str, int] = {}
+    
+    async def start_polling(self):
+        """Serve the webhook until stop_polling is called"""
+        if not AIOHTTP_AVAILABLE:
+            self.logger.error("Cannot start webhook server: aiohttp not installed")
+            return
+        
+        if not self.telegram_service.is_configured():
+            self.logger.error("Cannot start webhook server: Telegram not configured")
+            return
+        
+        if not self.public_url or not self.secret_token:
+            self.logger.error("Cannot start webhook server: TELEGRAM_WEBHOOK_URL and TELEGRAM_WEBHOOK_SECRET are required")
+            return
+        
+        app = web.Application()
+        app.router.add_post(f"/webhook/{self.secret_token}", self._handle_webhook)
+        
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        
+        self.running = True
+        self._stopped = asyncio.Event()
+        self.logger.info(f"Telegram webhook server listening on {self.host}:{self.port}")
+        
+        loop = asyncio.get_running_loop()
+        try:
+            webhook_url = f"{self.public_url}/webhook/{self.secret_token}"
+            if not await loop.run_in_executor(
+                None, self.telegram_service.set_webhook, webhook_url, self.secret_token
+            ):
+                self.logger.error("Could not register Telegram webhook")
+                return
+            self.logger.info(f"Webhook set to {self.public_url}")
+            
+            await self._stopped.wait()
+        finally:
+            self.running = False
+            await loop.run_in_executor(None, self.telegram_service.delete_webhook)
+            
+            # Stop in-flight handlers before the caller releases shared clients
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            await self._runner.cleanup()
+    
+    async def _handle_webhook(self, request):
+        """Accept an update and acknowledge it immediately"""
+        if request.headers.get(self.SECRET_HEADER) != self.secret_token:
+            return web.Response(status=403)
+        
+        # Shutting down: Telegram retries the update later
+        if not self.running:
+            return web.Response(status=503)
+        
+        try:
+            update = await request.json()
+        except Exception as e:
+            self.logger.warning(f"Invalid webhook payload: {e}")
+            return web.Response(status=400)
+        
+        task = asyncio.create_task(self._dispatch_update(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response(status=200)
+    
+    async def _dispatch_update(self, update: Dict):
+        """Process an update after any earlier update from the same chat"""
+        chat_id = str(update.get('message', {}).get('chat', {}).get('id', ''))
+        lock = self._chat_locks.get(chat_id)
+        if lock is None:
+            lock = self._chat_locks[chat_id] = asyncio.Lock()
+        self._chat_pending[chat_id] = self._chat_pending.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                await self._process_update(update)
+        finally:
+            self._chat_pending[chat_id] -= 1
+            if not self._chat_pending[chat_id]:
+                del self._chat_pending[chat_id]
+                del self._chat_locks[chat_id]
+    
+    def stop_polling(self):
+        """Stop serving the webhook"""
+        self.running = False
+        if self._stopped:
+            self._stopped.set()
+        self.logger.info("Stopping Telegram webhook server...")
+
+
 # Convenience functions for the new bot architecture
 def init_telegram_from_env() -> TelegramService:
     """Initialize Telegram service from environment variables"""
@@ -5,28 +5,50 @@ Provides a unified interface for LLM to discover and use tools.
 
 import json
 import logging
-from typing import Dict, Any, List, Callable, Optional
+from functools import cached_property
+from typing import Dict, Any, List, Callable, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from abc import ABC, abstractmethod
 
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    msgspec = None
+    MSGSPEC_AVAILABLE = False
 
-@dataclass
-class ToolParameter:
-    """Definition of a tool parameter"""
-    name: str
-    type: str
-    description: str
-    required: bool = True
-    default: Any = None
-
-
-@dataclass
-class ToolResult:
-    """Result from tool execution"""
-    success: bool
-    data: Any = None
-    error: str = None
+# Slotted msgspec structs when available, plain dataclasses otherwise
+if MSGSPEC_AVAILABLE:
+    class ToolParameter(msgspec.Struct):
+        """Definition of a tool parameter"""
+        name: str
+        type: str
+        description: str
+        required: bool = True
+        default: Any = None
+    
+    class ToolResult(msgspec.Struct):
+        """Result from tool execution"""
+        success: bool
+        data: Any = None
+        error: str = None
+else:
+    @dataclass
+    class ToolParameter:
+        """Definition of a tool parameter"""
+        name: str
+        type: str
+        description: str
+        required: bool = True
+        default: Any = None
+    
+    @dataclass
+    class ToolResult:
+        """Result from tool execution"""
+        success: bool
+        data: Any = None
+        error: str = None
 
 
 class BaseTool(ABC):
@@ -57,6 +79,11 @@ class BaseTool(ABC):
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert tool to dictionary for LLM"""
+        return self._cached_dict
+    
+    @cached_property
+    def _cached_dict(self) -> Dict[str, Any]:
+        """Tool dictionary, built once since name/description/parameters are constant"""
         return {
             "name": self.name,
             "description": self.description,
@@ -73,25 +100,85 @@ class BaseTool(ABC):
         }
 
 
+def _class_tool_name(tool_class: type) -> str:
+    """Tool name read from the class, falling back to the class name"""
+    name = getattr(tool_class, 'name', None)
+    if isinstance(name, property):
+        try:
+            name = name.fget(None)
+        except Exception:
+            name = None
+    return name if isinstance(name, str) else tool_class.__name__
+
+
 class ToolRegistry:
     """Registry to manage all available tools"""
     
     def __init__(self):
-        self.tools: Dict[str, BaseTool] = {}
+        self._tools: Dict[str, BaseTool] = {}
+        # (position in registration order, tool name, class) for tools not instantiated yet
+        self._pending_classes: List[Tuple[int, str, type]] = []
         self.logger = logging.getLogger(__name__)
+        
+        # Tools are registered at startup, so these only change on register()
+        self._descriptions_cache: Optional[str] = None
+        self._definitions_cache: Optional[List[Dict[str, Any]]] = None
+    
+    @property
+    def tools(self) -> Dict[str, BaseTool]:
+        """Registered tools, instantiating classes added with register_class"""
+        while self._pending_classes:
+            position, name, tool_class = self._pending_classes.pop(0)
+            try:
+                tool = tool_class()
+            except Exception as e:
+                # Skip the broken tool so the others stay usable
+                self.logger.error(f"Error creating tool {name}: {e}")
+                self._pending_classes = [
+                    (p - 1 if p > position else p, n, c) for p, n, c in self._pending_classes
+                ]
+                continue
+            
+            # Keep registration order, which is the order tools reach the LLM prompt
+            items = list(self._tools.items())
+            items.insert(position, (tool.name, tool))
+            self._tools = dict(items)
+            self._descriptions_cache = None
+            self._definitions_cache = None
+            self.logger.info(f"Registered tool: {tool.name}")
+        return self._tools
     
     def register(self, tool: BaseTool):
         """Register a tool"""
-        self.tools[tool.name] = tool
+        self._tools[tool.name] = tool
+        self._descriptions_cache = None
+        self._definitions_cache = None
         self.logger.info(f"Registered tool: {tool.name}")
     
+    def register_class(self, tool_class: type) -> type:
+        """Class decorator registering a tool that is instantiated on first use"""
+        position = len(self._tools) + len(self._pending_classes)
+        self._pending_classes.append((position, _class_tool_name(tool_class), tool_class))
+        self._descriptions_cache = None
+        self._definitions_cache = None
+        return tool_class
+    
+    def registered_names(self) -> List[str]:
+        """Tool names in registration order, without instantiating pending tools"""
+        names = list(self._tools)
+        for position, name, tool_class in self._pending_classes:
+            names.insert(position, name)
+        return names
+    
     def get_tool(self, name: str) -> Optional[BaseTool]:
         """Get a tool by name"""
         return self.tools.get(name)
     
     def get_tool_definitions(self) -> List[Dict[str, Any]]:
         """Get all tool definitions for LLM"""
-        return [tool.to_dict() for tool in self.tools.values()]
+        if self._definitions_cache is None:
+            self._definitions_cache = [tool.to_dict() for tool in self.tools.values()]
+        return self._definitions_cache
     
     async def execute_tool(self, name: str, parameters: Dict[str, Any]) -> ToolResult:
         """Execute a tool with parameters"""
@@ -117,12 +204,16 @@ class ToolRegistry:
     
     def get_available_tools_description(self) -> str:
         """Get a description of all available tools for LLM context"""
+        if self._descriptions_cache is not None:
+            return self._descriptions_cache
+        
         descriptions = []
         for tool in self.tools.values():
             params_desc = ", ".join([f"{p.name}({p.type})" for p in tool.parameters])
             descriptions.append(f"- {tool.name}({params_desc}): {tool.description}")
         
-        return "Available tools:\n" + "\n".join(descriptions)
+        self._descriptions_cache = "Available tools:\n" + "\n".join(descriptions)
+        return self._descriptions_cache
 
 
 # Global registry instance
@@ -6,16 +6,36 @@ Safe Bot Starter - Ensures no conflicts with existing bot processes
 import os
 import sys
 import signal
-import subprocess
+import select
 import time
 import psutil
 from dotenv import load_dotenv
 
+from config import get_bot_pid_file
+
 # Load environment variables
 load_dotenv()
 
+def _find_bot_from_pidfile():
+    """Look up the bot through its pidfile, or None if missing or stale"""
+    try:
+        with open(get_bot_pid_file()) as f:
+            proc = psutil.Process(int(f.read().strip()))
+        if 'bot_new.py' in ' '.join(proc.cmdline()):
+            return [proc]
+    except (OSError, ValueError, psutil.NoSuchProcess, psutil.AccessDenied):
+        pass
+    return None
+
 def find_bot_processes():
     """Find all running bot processes"""
+    # Fast path: a single pidfile read instead of scanning every process.
+    # The pidfile only tracks the Telegram bot, so while it is valid a CLI
+    # session started directly with bot_new.py is left running.
+    bot_processes = _find_bot_from_pidfile()
+    if bot_processes is not None:
+        return bot_processes
+    
     bot_processes = []
     for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
         try:
@@ -26,8 +46,25 @@ def find_bot_processes():
             continue
     return bot_processes
 
+def _wait_for_exit(proc, timeout=5):
+    """Wait for a process to exit, sleeping on a pidfd when the kernel supports it"""
+    try:
+        fd = os.pidfd_open(proc.pid)
+    except (OSError, AttributeError):
+        # Python < 3.9, kernel < 5.3 or non-Linux: psutil's polling wait
+        proc.wait(timeout=timeout)
+        return
+    
+    try:
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        if not poller.poll(timeout * 1000):
+            raise psutil.TimeoutExpired(timeout, proc.pid)
+    finally:
+        os.close(fd)
+
 def kill_existing_bots():
-    """Kill any existing bot processes"""
+    """Kill any existing bot processes, returning True if any were found"""
     processes = find_bot_processes()
     if processes:
         print(f"🔄 Found {len(processes)} existing bot process(es), terminating...")
@@ -35,18 +72,21 @@ def kill_existing_bots():
             try:
                 print(f"   Killing PID {proc.pid}: {' '.join(proc.cmdline())}")
                 proc.terminate()
-                proc.wait(timeout=5)  # Wait up to 5 seconds for graceful termination
+                _wait_for_exit(proc, timeout=5)  # Wait up to 5 seconds for graceful termination
             except (psutil.TimeoutExpired, psutil.NoSuchProcess):
                 try:
                     proc.kill()  # Force kill if graceful termination fails
                 except psutil.NoSuchProcess:
                     pass
         
-        # Wait a moment for processes to fully terminate
-        time.sleep(2)
+        # Wait up to 2 seconds for processes to fully terminate
+        for _ in range(20):
+            remaining = [proc for proc in processes if proc.is_running()]
+            if not remaining:
+                break
+            time.sleep(0.1)
         
         # Verify all processes are gone
-        remaining = find_bot_processes()
         if remaining:
             print(f"⚠️ Warning: {len(remaining)} process(es) still running")
             for proc in remaining:
@@ -56,8 +96,10 @@ def kill_existing_bots():
                     pass
         else:
             print("✅ All existing bot processes terminated")
+        return True
     else:
         print("✅ No existing bot processes found")
+        return False
 
 def start_bot(mode='telegram'):
     """Start the bot in specified mode"""
@@ -73,16 +115,14 @@ def start_bot(mode='telegram'):
     else:
         cmd = [sys.executable, 'bot_new.py']
     
-    # Start the bot
+    # Replace this process with the bot so no idle parent stays resident
     try:
         if mode == 'telegram':
             print("📱 Telegram bot starting... (Press Ctrl+C to stop)")
-            subprocess.run(cmd)
         else:
             print("💻 CLI bot starting...")
-            subprocess.run(cmd)
-    except KeyboardInterrupt:
-        print("\n👋 Bot stopped by user")
+        sys.stdout.flush()
+        os.execv(sys.executable, cmd)
     except Exception as e:
         print(f"❌ Error starting bot: {e}")
 
@@ -101,10 +141,10 @@ def main():
             sys.exit(1)
     
     # Kill any existing processes
-    kill_existing_bots()
+    killed = kill_existing_bots()
     
-    # Wait a moment for Telegram API to clear any conflicts
-    if mode == 'telegram':
+    # Wait a moment for Telegram API to clear conflicts left by a killed bot
+    if mode == 'telegram' and killed:
         print("⏳ Waiting for Telegram API to clear conflicts...")
         time.sleep(5)
     
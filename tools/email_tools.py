@@ -4,44 +4,192 @@ Provides email search, listing, and creation capabilities.
 """
 
 import os
+import re
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+import threading
+import importlib.util
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from datetime import date, datetime, timedelta
 import base64
 from email.mime.text import MIMEText
 
-from services.tool_registry import BaseTool, ToolParameter, ToolResult
+from services.tool_registry import BaseTool, ToolParameter, ToolResult, tool_registry
 
-try:
-    from services.google_auth import GoogleAuthManager
-    from googleapiclient.errors import HttpError
-    GOOGLE_AVAILABLE = True
-except ImportError:
-    GoogleAuthManager = None
-    HttpError = Exception
-    GOOGLE_AVAILABLE = False
+# The Google client is imported on first use; None until that is checked
+GOOGLE_AVAILABLE: Optional[bool] = None
 
+# Packages services.google_auth imports
+_GOOGLE_MODULES = ('googleapiclient', 'google_auth_oauthlib', 'google_auth_httplib2', 'httplib2')
 
-class SearchEmailsTool(BaseTool):
-    """Search for emails based on query and time range"""
+# Only these headers are used, so ask Gmail for message metadata only
+_METADATA_HEADERS = ['Subject', 'From', 'To', 'Date']
+_WANTED_HEADERS = frozenset(('subject', 'from', 'to', 'date'))
+_UNREAD_WANTED_HEADERS = frozenset(('subject', 'from', 'date'))
+
+# Partial-response masks so Gmail only returns the fields the tools read
+_LIST_FIELDS = 'messages/id,resultSizeEstimate'
+_SEARCH_DETAIL_FIELDS = 'id,threadId,snippet,labelIds,payload/headers'
+_UNREAD_DETAIL_FIELDS = 'id,threadId,snippet,payload/headers'
+
+# Header lines longer than this are folded by the email package
+_MAX_HEADER_LINE = 78
+
+# A query that already limits its time range gets no implicit "after:"
+_TIME_QUALIFIER_RE = re.compile(r'(?i)(?:after|before):')
+
+# English names matching strftime's %A/%B in the default C locale
+_WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+_MONTHS = ('January', 'February', 'March', 'April', 'May', 'June', 'July',
+           'August', 'September', 'October', 'November', 'December')
+
+_SCOPES = [
+    'https://www.googleapis.com/auth/gmail.readonly',
+    'https://www.googleapis.com/auth/gmail.send',
+    'https://www.googleapis.com/auth/calendar.readonly',
+    'https://www.googleapis.com/auth/calendar'
+]
+
+# Gmail client shared by all email tools, created on first use
+_gmail_client = None
+
+
+async def _run_blocking(func):
+    """Run a blocking Google API call without stalling the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(None, func)
+
+
+def _google_available() -> bool:
+    """Check once whether the Google API client is installed, without importing it"""
+    global GOOGLE_AVAILABLE
+    if GOOGLE_AVAILABLE is None:
+        GOOGLE_AVAILABLE = all(
+            importlib.util.find_spec(module) is not None for module in _GOOGLE_MODULES
+        )
+    return GOOGLE_AVAILABLE
+
+
+class _GmailBatchClient:
+    """googleapiclient-backed Gmail client with the same interface as GmailRest"""
     
-    def __init__(self):
+    def __init__(self, service, http_factory: Callable[[], Any]):
+        self._service = service
+        self._http_factory = http_factory
+        self._local = threading.local()
         self.logger = logging.getLogger(__name__)
-        self._auth_manager = None
-        self._service = None
+    
+    def _http(self):
+        """Transport for the calling executor thread, since httplib2.Http is not thread-safe"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = self._http_factory()
+        return http
+    
+    async def _execute(self, request) -> Any:
+        """Execute a request or batch in the executor on that thread's own transport"""
+        return await _run_blocking(lambda: request.execute(http=self._http()))
+    
+    async def list_messages(self, query: str, max_results: int, fields: Optional[str] = None) -> Dict[str, Any]:
+        """List messages matching a Gmail search query"""
+        return await self._execute(self._service.users().messages().list(
+            userId='me',
+            q=query,
+            maxResults=max_results,
+            fields=fields
+        ))
+    
+    async def get_messages(self, message_ids: List[str], metadata_headers: List[str],
+                           fields: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get several messages in one batch request, skipping the ones that fail"""
+        messages = []
+        if not message_ids:
+            return messages
+        
+        def handle_details(request_id, email_details, exception):
+            if exception is not None:
+                self.logger.warning(f"Failed to get details for email {request_id}: {exception}")
+            else:
+                messages.append(email_details)
         
-        if GOOGLE_AVAILABLE:
-            try:
-                credentials_path = os.getenv('GOOGLE_CREDENTIALS_PATH', 'credentials/credentials.json')
-                scopes = [
-                    'https://www.googleapis.com/auth/gmail.readonly',
-                    'https://www.googleapis.com/auth/gmail.send',
-                    'https://www.googleapis.com/auth/calendar.readonly',
-                    'https://www.googleapis.com/auth/calendar'
-                ]
-                self._auth_manager = GoogleAuthManager(credentials_path, scopes)
-            except Exception as e:
-                self.logger.warning(f"Could not initialize Google Auth: {e}")
+        batch = self._service.new_batch_http_request(callback=handle_details)
+        for message_id in message_ids:
+            batch.add(
+                self._service.users().messages().get(
+                    userId='me',
+                    id=message_id,
+                    format='metadata',
+                    metadataHeaders=metadata_headers,
+                    fields=fields
+                ),
+                request_id=message_id
+            )
+        await self._execute(batch)
+        return messages
+    
+    async def get_label(self, label_id: str, fields: Optional[str] = None) -> Dict[str, Any]:
+        """Get a label, including its message counters"""
+        return await self._execute(self._service.users().labels().get(
+            userId='me',
+            id=label_id,
+            fields=fields
+        ))
+    
+    async def send(self, message: Dict[str, str]) -> Dict[str, Any]:
+        """Send a message given as {'raw': <base64url RFC 5322>}"""
+        return await self._execute(self._service.users().messages().send(
+            userId='me',
+            body=message
+        ))
+
+
+def _get_shared_gmail_client():
+    """Get the Gmail client, authenticating once for all email tools"""
+    global _gmail_client
+    if _gmail_client is None and _google_available():
+        from services.google_auth import GoogleAuthManager
+        credentials_path = os.getenv('GOOGLE_CREDENTIALS_PATH', 'credentials/credentials.json')
+        auth_manager = GoogleAuthManager(credentials_path, _SCOPES)
+        try:
+            from services.gmail_rest import GmailRest
+        except ImportError:
+            # httpx not installed: fall back to googleapiclient batch requests
+            _gmail_client = _GmailBatchClient(auth_manager.get_gmail_service(), auth_manager.authorized_http)
+        else:
+            _gmail_client = GmailRest(auth_manager.get_credentials(), on_refresh=auth_manager.save_credentials)
+    return _gmail_client
+
+
+async def close_gmail_client():
+    """Close the shared Gmail client's connections, if one was created"""
+    global _gmail_client
+    client, _gmail_client = _gmail_client, None
+    if client is not None and hasattr(client, 'aclose'):
+        await client.aclose()
+
+
+class _GmailToolBase(BaseTool):
+    """Shared setup for tools that talk to Gmail"""
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+    
+    def _get_service(self):
+        """Get Gmail client instance"""
+        try:
+            return _get_shared_gmail_client()
+        except Exception as e:
+            self.logger.error(f"Could not get Gmail service: {e}")
+            return None
+
+
+@tool_registry.register_class
+class SearchEmailsTool(_GmailToolBase):
+    """Search for emails based on query and time range"""
+    
+    def __init__(self):
+        super().__init__()
+        # days_back -> (day computed, "after:" cutoff), valid until the date changes
+        self._cutoff_cache: Dict[int, Tuple[date, str]] = {}
     
     @property
     def name(self) -> str:
@@ -59,18 +207,9 @@ class SearchEmailsTool(BaseTool):
             ToolParameter("days_back", "integer", "Search emails from N days back", required=False, default=7)
         ]
     
-    def _get_service(self):
-        """Get Gmail service instance"""
-        if not self._service and self._auth_manager:
-            try:
-                self._service = self._auth_manager.get_gmail_service()
-            except Exception as e:
-                self.logger.error(f"Could not get Gmail service: {e}")
-        return self._service
-    
     async def execute(self, query: str = "", max_results: int = 20, days_back: int = 7) -> ToolResult:
         """Execute email search"""
-        if not GOOGLE_AVAILABLE:
+        if not _google_available():
             return ToolResult(success=False, error="Google API not available")
         
         service = self._get_service()
@@ -80,8 +219,14 @@ class SearchEmailsTool(BaseTool):
         try:
             # Build search query
             search_query = query
-            if days_back and not any(word in query.lower() for word in ['after:', 'before:']):
-                cutoff_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y/%m/%d')
+            if days_back and not _TIME_QUALIFIER_RE.search(query):
+                today = date.today()
+                cached = self._cutoff_cache.get(days_back)
+                if cached and cached[0] == today:
+                    cutoff_date = cached[1]
+                else:
+                    cutoff_date = (today - timedelta(days=days_back)).strftime('%Y/%m/%d')
+                    self._cutoff_cache[days_back] = (today, cutoff_date)
                 if search_query:
                     search_query += f" after:{cutoff_date}"
                 else:
@@ -90,63 +235,54 @@ class SearchEmailsTool(BaseTool):
             self.logger.info(f"Searching emails with query: {search_query}")
             
             # Search for emails
-            response = service.users().messages().list(
-                userId='me',
-                q=search_query,
-                maxResults=min(max_results, 50)  # Safety limit
-            ).execute()
+            response = await service.list_messages(
+                search_query,
+                min(max_results, 50),  # Safety limit
+                fields=_LIST_FIELDS
+            )
             
             messages = response.get('messages', [])
             self.logger.info(f"Found {len(messages)} emails")
             
-            # Get detailed information for each email
+            # Get detailed information for the emails in one round-trip
+            message_ids = [message['id'] for message in messages[:max_results]]
+            details = await service.get_messages(
+                message_ids,
+                _METADATA_HEADERS,
+                fields=_SEARCH_DETAIL_FIELDS
+            )
+            
             emails = []
-            for message in messages[:max_results]:
-                try:
-                    email_details = service.users().messages().get(
-                        userId='me',
-                        id=message['id'],
-                        format='full'
-                    ).execute()
-                    
-                    # Parse email details
-                    headers = email_details['payload'].get('headers', [])
-                    email_data = {
-                        'id': message['id'],
-                        'thread_id': email_details.get('threadId'),
-                        'subject': '',
-                        'from': '',
-                        'to': '',
-                        'date': '',
-                        'snippet': email_details.get('snippet', ''),
-                        'labels': email_details.get('labelIds', [])
-                    }
-                    
-                    # Extract header information
-                    for header in headers:
-                        name = header['name'].lower()
-                        value = header['value']
-                        if name == 'subject':
-                            email_data['subject'] = value
-                        elif name == 'from':
-                            email_data['from'] = value
-                        elif name == 'to':
-                            email_data['to'] = value
-                        elif name == 'date':
-                            email_data['date'] = value
-                    
-                    emails.append(email_data)
-                    
-                except Exception as e:
-                    self.logger.warning(f"Failed to get details for email {message['id']}: {e}")
-                    continue
+            for email_details in details:
+                # Parse email details
+                headers = email_details.get('payload', {}).get('headers', [])
+                email_data = {
+                    'id': email_details.get('id'),
+                    'thread_id': email_details.get('threadId'),
+                    'subject': '',
+                    'from': '',
+                    'to': '',
+                    'date': '',
+                    'snippet': email_details.get('snippet', ''),
+                    'labels': email_details.get('labelIds', [])
+                }
+                
+                # Extract header information
+                for header in headers:
+                    name = header['name'].lower()
+                    if name in _WANTED_HEADERS:
+                        email_data[name] = header['value']
+                
+                emails.append(email_data)
             
             return ToolResult(
                 success=True,
                 data={
                     'emails': emails,
                     'total_found': len(messages),
-                    'search_query': search_query
+                    'result_size_estimate': response.get('resultSizeEstimate', len(messages)),
+                    'search_query': search_query,
+                    'details_missing': len(message_ids) - len(details)
                 }
             )
             
@@ -157,27 +293,10 @@ class SearchEmailsTool(BaseTool):
             )
 
 
-class GetUnreadEmailsTool(BaseTool):
+@tool_registry.register_class
+class GetUnreadEmailsTool(_GmailToolBase):
     """Get list of unread emails"""
     
-    def __init__(self):
-        self.logger = logging.getLogger(__name__)
-        self._auth_manager = None
-        self._service = None
-        
-        if GOOGLE_AVAILABLE:
-            try:
-                credentials_path = os.getenv('GOOGLE_CREDENTIALS_PATH', 'credentials/credentials.json')
-                scopes = [
-                    'https://www.googleapis.com/auth/gmail.readonly',
-                    'https://www.googleapis.com/auth/gmail.send',
-                    'https://www.googleapis.com/auth/calendar.readonly',
-                    'https://www.googleapis.com/auth/calendar'
-                ]
-                self._auth_manager = GoogleAuthManager(credentials_path, scopes)
-            except Exception as e:
-                self.logger.warning(f"Could not initialize Google Auth: {e}")
-    
     @property
     def name(self) -> str:
         return "get_unread_emails"
@@ -189,21 +308,13 @@ class GetUnreadEmailsTool(BaseTool):
     @property
     def parameters(self) -> List[ToolParameter]:
         return [
-            ToolParameter("max_results", "integer", "Maximum number of unread emails to return", required=False, default=10)
+            ToolParameter("max_results", "integer", "Maximum number of unread emails to return", required=False, default=10),
+            ToolParameter("count_only", "boolean", "Only count unread emails, without fetching their details", required=False, default=False)
         ]
     
-    def _get_service(self):
-        """Get Gmail service instance"""
-        if not self._service and self._auth_manager:
-            try:
-                self._service = self._auth_manager.get_gmail_service()
-            except Exception as e:
-                self.logger.error(f"Could not get Gmail service: {e}")
-        return self._service
-    
-    async def execute(self, max_results: int = 10) -> ToolResult:
+    async def execute(self, max_results: int = 10, count_only: bool = False) -> ToolResult:
         """Execute unread emails retrieval"""
-        if not GOOGLE_AVAILABLE:
+        if not _google_available():
             return ToolResult(success=False, error="Google API not available")
         
         service = self._get_service()
@@ -211,60 +322,65 @@ class GetUnreadEmailsTool(BaseTool):
             return ToolResult(success=False, error="Gmail service not available")
         
         try:
+            # The LLM may send the flag as a JSON string, and "false" is truthy
+            if count_only is True or str(count_only).lower() == 'true':
+                # The UNREAD label carries the count, so one small call is enough
+                label = await service.get_label('UNREAD', fields='messagesUnread')
+                
+                return ToolResult(
+                    success=True,
+                    data={
+                        'unread_emails': [],
+                        'total_unread': label.get('messagesUnread', 0)
+                    }
+                )
+            
             # Search for unread emails
-            response = service.users().messages().list(
-                userId='me',
-                q='is:unread',
-                maxResults=min(max_results, 50)  # Safety limit
-            ).execute()
+            response = await service.list_messages(
+                'is:unread',
+                min(max_results, 50),  # Safety limit
+                fields=_LIST_FIELDS
+            )
             
             messages = response.get('messages', [])
             self.logger.info(f"Found {len(messages)} unread emails")
             
-            # Get detailed information for each email
+            # Get detailed information for the emails in one round-trip
+            message_ids = [message['id'] for message in messages[:max_results]]
+            details = await service.get_messages(
+                message_ids,
+                _METADATA_HEADERS,
+                fields=_UNREAD_DETAIL_FIELDS
+            )
+            
             emails = []
-            for message in messages[:max_results]:
-                try:
-                    email_details = service.users().messages().get(
-                        userId='me',
-                        id=message['id'],
-                        format='full'
-                    ).execute()
-                    
-                    # Parse email details
-                    headers = email_details['payload'].get('headers', [])
-                    email_data = {
-                        'id': message['id'],
-                        'thread_id': email_details.get('threadId'),
-                        'subject': '',
-                        'from': '',
-                        'date': '',
-                        'snippet': email_details.get('snippet', ''),
-                        'is_unread': True
-                    }
-                    
-                    # Extract header information
-                    for header in headers:
-                        name = header['name'].lower()
-                        value = header['value']
-                        if name == 'subject':
-                            email_data['subject'] = value
-                        elif name == 'from':
-                            email_data['from'] = value
-                        elif name == 'date':
-                            email_data['date'] = value
-                    
-                    emails.append(email_data)
-                    
-                except Exception as e:
-                    self.logger.warning(f"Failed to get details for email {message['id']}: {e}")
-                    continue
+            for email_details in details:
+                # Parse email details
+                headers = email_details.get('payload', {}).get('headers', [])
+                email_data = {
+                    'id': email_details.get('id'),
+                    'thread_id': email_details.get('threadId'),
+                    'subject': '',
+                    'from': '',
+                    'date': '',
+                    'snippet': email_details.get('snippet', ''),
+                    'is_unread': True
+                }
+                
+                # Extract header information
+                for header in headers:
+                    name = header['name'].lower()
+                    if name in _UNREAD_WANTED_HEADERS:
+                        email_data[name] = header['value']
+                
+                emails.append(email_data)
             
             return ToolResult(
                 success=True,
                 data={
                     'unread_emails': emails,
-                    'total_unread': len(messages)
+                    'total_unread': len(messages),
+                    'details_missing': len(message_ids) - len(details)
                 }
             )
             
@@ -275,27 +391,10 @@ class GetUnreadEmailsTool(BaseTool):
             )
 
 
-class CreateEmailTool(BaseTool):
+@tool_registry.register_class
+class CreateEmailTool(_GmailToolBase):
     """Create and send a new email"""
     
-    def __init__(self):
-        self.logger = logging.getLogger(__name__)
-        self._auth_manager = None
-        self._service = None
-        
-        if GOOGLE_AVAILABLE:
-            try:
-                credentials_path = os.getenv('GOOGLE_CREDENTIALS_PATH', 'credentials/credentials.json')
-                scopes = [
-                    'https://www.googleapis.com/auth/gmail.readonly',
-                    'https://www.googleapis.com/auth/gmail.send',
-                    'https://www.googleapis.com/auth/calendar.readonly',
-                    'https://www.googleapis.com/auth/calendar'
-                ]
-                self._auth_manager = GoogleAuthManager(credentials_path, scopes)
-            except Exception as e:
-                self.logger.warning(f"Could not initialize Google Auth: {e}")
-    
     @property
     def name(self) -> str:
         return "create_email"
@@ -314,34 +413,41 @@ class CreateEmailTool(BaseTool):
             ToolParameter("bcc", "string", "BCC recipients (comma-separated)", required=False, default="")
         ]
     
-    def _get_service(self):
-        """Get Gmail service instance"""
-        if not self._service and self._auth_manager:
-            try:
-                self._service = self._auth_manager.get_gmail_service()
-            except Exception as e:
-                self.logger.error(f"Could not get Gmail service: {e}")
-        return self._service
-    
     def _create_message(self, to: str, subject: str, body: str, cc: str = "", bcc: str = ""):
         """Create email message"""
-        message = MIMEText(body)
-        message['to'] = to
-        message['subject'] = subject
-        
-        if cc:
-            message['cc'] = cc
-        if bcc:
-            message['bcc'] = bcc
+        headers = (('to', to), ('subject', subject), ('cc', cc), ('bcc', bcc))
+        if (body.isascii() and '\r' not in body
+                and all(value.isascii() and '\r' not in value and '\n' not in value
+                        and len(name) + 2 + len(value) <= _MAX_HEADER_LINE
+                        for name, value in headers)):
+            # Short plain-ASCII headers need no encoding or folding, so skip the MIME
+            # generator and emit what MIMEText.as_bytes() would, LF line endings included
+            raw = ('Content-Type: text/plain; charset="us-ascii"\n'
+                   + "MIME-Version: 1.0\n"
+                   + "Content-Transfer-Encoding: 7bit\n"
+                   + f"to: {to}\nsubject: {subject}\n"
+                   + (f"cc: {cc}\n" if cc else "")
+                   + (f"bcc: {bcc}\n" if bcc else "")
+                   + "\n"
+                   + body).encode('ascii')
+        else:
+            message = MIMEText(body)
+            message['to'] = to
+            message['subject'] = subject
+            
+            if cc:
+                message['cc'] = cc
+            if bcc:
+                message['bcc'] = bcc
+            
+            raw = message.as_bytes()
         
         # Encode message
-        raw = base64.urlsafe_b64encode(message.as_bytes())
-        raw = raw.decode()
-        return {'raw': raw}
+        return {'raw': base64.urlsafe_b64encode(raw).decode('ascii')}
     
     async def execute(self, to: str, subject: str, body: str, cc: str = "", bcc: str = "") -> ToolResult:
         """Execute email creation and sending"""
-        if not GOOGLE_AVAILABLE:
+        if not _google_available():
             return ToolResult(success=False, error="Google API not available")
         
         service = self._get_service()
@@ -353,10 +459,7 @@ class CreateEmailTool(BaseTool):
             message = self._create_message(to, subject, body, cc, bcc)
             
             # Send email
-            sent_message = service.users().messages().send(
-                userId='me',
-                body=message
-            ).execute()
+            sent_message = await service.send(message)
             
             self.logger.info(f"Email sent successfully: {sent_message['id']}")
             
@@ -377,6 +480,7 @@ class CreateEmailTool(BaseTool):
             )
 
 
+@tool_registry.register_class
 class GetCurrentTimeTool(BaseTool):
     """Get current date and time"""
     
@@ -400,25 +504,10 @@ class GetCurrentTimeTool(BaseTool):
             success=True,
             data={
                 'current_datetime': now.isoformat(),
-                'current_date': now.strftime('%Y-%m-%d'),
-                'current_time': now.strftime('%H:%M:%S'),
-                'current_weekday': now.strftime('%A'),
-                'current_month_year': now.strftime('%B %Y'),
+                'current_date': f"{now.year:04d}-{now.month:02d}-{now.day:02d}",
+                'current_time': f"{now.hour:02d}:{now.minute:02d}:{now.second:02d}",
+                'current_weekday': _WEEKDAYS[now.weekday()],
+                'current_month_year': f"{_MONTHS[now.month - 1]} {now.year}",
                 'timestamp': now.timestamp()
             }
-        )
-
-
-def register_email_tools():
-    """Register all email tools with the global registry"""
-    from services.tool_registry import tool_registry
-    
-    tools = [
-        SearchEmailsTool(),
-        GetUnreadEmailsTool(),
-        CreateEmailTool(),
-        GetCurrentTimeTool()
-    ]
-    
-    for tool in tools:
-        tool_registry.register(tool)
\ No newline at end of file
+        )
\ No newline at end of file